@@ -1,26 +1,44 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, ORJSONResponse
 import uvicorn
+import asyncio
 from datetime import datetime
 import json
 import os
+import uuid
 from typing import List
 
-from app.models.base import EmailContent, Order
+from app.models.base import EmailContent, Order, DeliveryDetails
 from app.services.email_processor import EmailProcessor
 from app.services.pdf_form_filler import PDFFormFiller
 from app.services.order_aggregator import OrderAggregator
+from app.services.order_store import OrderStore
 from app.models.base import OrderRequest
+from redis.exceptions import RedisError
 
-app = FastAPI(title="Smart Order Intake System")
+app = FastAPI(title="Smart Order Intake System", default_response_class=ORJSONResponse)
 
-# In-memory order store
-ORDERS = {}
+# Order store shared by all workers; also tracks the last processed order for fallback
+order_store = OrderStore(
+    redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    ttl_seconds=int(os.getenv("ORDER_TTL_SECONDS", "86400"))
+)
+
+@app.exception_handler(RedisError)
+async def order_store_unavailable(request: Request, exc: RedisError):
+    """Orders can't be saved or read without Redis; report that instead of a generic 500."""
+    print(f"Order store error: {exc}")
+    return ORJSONResponse(status_code=503, content={"detail": "Order store unavailable"})
 
-# Keep track of the last processed order for fallback
-LAST_PROCESSED_ORDER = None
+# Where generated sales-order PDFs are written and served from
+GENERATED_ORDERS_DIR = "content/generated_orders"
+
+# Cap per-request and total memory spent buffering uploaded emails
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_SEMAPHORE = asyncio.Semaphore(8)
 
 # Configure CORS
 app.add_middleware(
@@ -41,37 +59,81 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 pdf_form_filler = PDFFormFiller(template_path="content/sales_order_form_full.pdf")
 order_aggregator = OrderAggregator()
 
+def to_order_request(order: Order) -> OrderRequest:
+    """Convert a processed email order into the shape OrderAggregator tracks."""
+    return OrderRequest(
+        id=order.order_id,
+        customer_name=order.customer_email,
+        items=order.items,
+        delivery_details=order.delivery_details or DeliveryDetails(),
+        notes=order.notes,
+        created_at=order.created_at,
+        status=order.status,
+        total_confidence_score=order.total_confidence_score,
+        validation_issues=order.validation_issues
+    )
+
+def render_order_pdf(order_data: dict, pdf_path: str):
+    """Background task: write the order PDF, or a .failed marker so pollers stop waiting."""
+    try:
+        pdf_form_filler.save_filled_form(order_data, pdf_path)
+    except Exception as e:
+        print(f"Error generating PDF {pdf_path}: {e}")
+        with open(f"{pdf_path}.failed", "w") as f:
+            f.write(str(e))
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an uploaded file in chunks, rejecting it once it exceeds MAX_UPLOAD_BYTES."""
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Uploaded file is too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 @app.post("/api/process-email")
-async def process_email(file: UploadFile = File(...)):
+async def process_email(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Process raw email content and extract order information."""
     try:
-        result = await email_processor.process_email(file)
-        order_id = result.get("order_id")
-        global LAST_PROCESSED_ORDER
-        if order_id:
-            ORDERS[order_id] = result
-            LAST_PROCESSED_ORDER = result
-        order_aggregator.add_order(result)
-        output_dir = "content/generated_orders"
-        os.makedirs(output_dir, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pdf_path = os.path.join(output_dir, f"order_{timestamp}.pdf")
+        async with UPLOAD_SEMAPHORE:
+            content = await read_upload(file)
+            email_content = EmailContent(
+                raw_content=content.decode(),
+                received_at=datetime.now()
+            )
+            order = await asyncio.to_thread(email_processor.process_email, email_content)
+        result = order.dict()
+        os.makedirs(GENERATED_ORDERS_DIR, exist_ok=True)
+        # Unique per request, so concurrent orders never share (or download each other's) PDF
+        pdf_path = os.path.join(GENERATED_ORDERS_DIR, f"order_{order.order_id}_{uuid.uuid4().hex}.pdf")
         order_data = {
-            "customer_name": result.get("customer_name", "N/A"),
-            "delivery_details": result.get("delivery_details", {}),
+            "customer_name": result.get("customer_email", "N/A"),
+            "delivery_details": result.get("delivery_details") or {},
             "items": [
                 {
-                    "sku": item.sku,
-                    "quantity": item.quantity,
-                    "price": item.price
+                    "sku": item["sku"],
+                    "quantity": item["quantity"],
+                    "price": item["price"]
                 }
                 for item in result.get("items", [])
             ],
             "notes": result.get("notes", "")
         }
-        pdf_form_filler.save_filled_form(order_data, pdf_path)
+        # Render the PDF after the response is sent; clients fetch it via /api/download-pdf/{pdf_filename}
+        background_tasks.add_task(render_order_pdf, order_data, pdf_path)
         result["pdf_path"] = pdf_path
+        result["pdf_filename"] = os.path.basename(pdf_path)
+        # Save last, so a failure above doesn't leave a half-processed order in the store
+        order_id = result.get("order_id")
+        if order_id:
+            await order_store.save(order_id, result)
+        # Count the order only once it is stored, so a client retrying after a Redis error can't count it twice
+        order_aggregator.add_order(to_order_request(order))
         return result
+    except (HTTPException, RedisError):
+        raise
     except Exception as e:
         print(f"Error in process_email: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -80,18 +142,19 @@ async def process_email(file: UploadFile = File(...)):
 async def upload_email(file: UploadFile = File(...)):
     """Upload and process email content from a file."""
     try:
-        content = await file.read()
-        email_content = EmailContent(
-            raw_content=content.decode(),
-            received_at=datetime.now()
-        )
-        order = email_processor.process_email(email_content)
+        async with UPLOAD_SEMAPHORE:
+            content = await read_upload(file)
+            email_content = EmailContent(
+                raw_content=content.decode(),
+                received_at=datetime.now()
+            )
+            order = await asyncio.to_thread(email_processor.process_email, email_content)
         order_id = order.order_id if hasattr(order, 'order_id') else None
-        global LAST_PROCESSED_ORDER
         if order_id:
-            ORDERS[order_id] = order
-            LAST_PROCESSED_ORDER = order
+            await order_store.save(order_id, order.dict())
         return order
+    except (HTTPException, RedisError):
+        raise
     except Exception as e:
         print(f"Error in upload_email: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,23 +170,20 @@ async def validate_order(order_id: str):
 async def approve_order(order: Order):
     """Approve and finalize an order."""
     order_id = order.order_id
-    if not order_id or order_id not in ORDERS:
-        raise HTTPException(status_code=404, detail="Order not found")
     # Update status
-    ORDERS[order_id]["status"] = "approved"
+    if not order_id or not await order_store.update_status(order_id, "approved"):
+        raise HTTPException(status_code=404, detail="Order not found")
     return {"status": "approved", "order_id": order_id}
 
 @app.get("/api/export-pdf/{order_id}")
 async def export_pdf(order_id: str):
-    global LAST_PROCESSED_ORDER
-    if not LAST_PROCESSED_ORDER:
+    order = await order_store.get_last()
+    if not order:
         raise HTTPException(status_code=404, detail="No order available for export. Please process an email first.")
-    order = LAST_PROCESSED_ORDER
-    output_dir = "content/generated_orders"
-    os.makedirs(output_dir, exist_ok=True)
-    pdf_path = os.path.join(output_dir, f"order_{order.get('order_id', 'latest')}.pdf")
+    os.makedirs(GENERATED_ORDERS_DIR, exist_ok=True)
+    pdf_path = os.path.join(GENERATED_ORDERS_DIR, f"order_{order.get('order_id', 'latest')}.pdf")
     order_data = {
-        "customer_name": order.get("customer_name", "N/A"),
+        "customer_name": order.get("customer_email", "N/A"),
         "delivery_details": order.get("delivery_details", {}),
         "items": [
             {
@@ -135,12 +195,14 @@ async def export_pdf(order_id: str):
         ],
         "notes": order.get("notes", "")
     }
-    pdf_form_filler.save_filled_form(order_data, pdf_path)
+    await asyncio.to_thread(pdf_form_filler.save_filled_form, order_data, pdf_path)
     return FileResponse(pdf_path, media_type="application/pdf", filename=os.path.basename(pdf_path))
 
 @app.get("/api/download-pdf/{filename}")
 async def download_pdf(filename: str):
-    pdf_path = os.path.join("content/generated_orders", filename)
+    pdf_path = os.path.join(GENERATED_ORDERS_DIR, filename)
+    if os.path.exists(f"{pdf_path}.failed"):
+        raise HTTPException(status_code=500, detail="PDF generation failed")
     if not os.path.exists(pdf_path):
         raise HTTPException(status_code=404, detail="PDF not found")
     return FileResponse(pdf_path, media_type="application/pdf", filename=filename)
@@ -176,4 +238,14 @@ async def root():
     return {"message": "Welcome to Smart Order Intake API"}
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # One worker by default: orders are shared through Redis, but OrderAggregator (insights, merge) and
+    # UPLOAD_SEMAPHORE are per process, so extra workers each see only their own orders and upload slots.
+    # "auto" picks uvloop/httptools when installed.
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        loop="auto",
+        http="auto"
+    ) 
\ No newline at end of file
@@ -20,8 +20,8 @@ class OrderItem(BaseModel):
     price: float = 0.0
 
 class DeliveryDetails(BaseModel):
-    address: str
-    date: str
+    address: Optional[str] = None
+    date: Optional[str] = None
     instructions: Optional[str] = None
 
 class OrderRequest(BaseModel):
@@ -40,6 +40,8 @@ class Order(BaseModel):
     customer_email: str
     items: List[OrderItem]
     delivery_preferences: Optional[str] = None
+    delivery_details: Optional[DeliveryDetails] = None
+    notes: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
     status: str = "pending"
     total_confidence_score: float = Field(ge=0.0, le=1.0)
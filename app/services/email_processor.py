@@ -1,22 +1,147 @@
 import re
-import difflib
+import csv
+import hashlib
+import threading
+from functools import lru_cache
+from cachetools import TTLCache
+from datetime import datetime
+try:
+    import re2 as _product_re
+    _PRODUCT_RE_FLAGS = 0
+except ImportError:
+    try:
+        import regex as _product_re
+        _PRODUCT_RE_FLAGS = _product_re.V1
+    except ImportError:
+        _product_re = re
+        _PRODUCT_RE_FLAGS = 0
 import dateparser
 from dateparser.search import search_dates
-from typing import List, Dict, Tuple
-import pandas as pd
+from typing import List, Dict, Tuple, Optional
+from rapidfuzz import process, fuzz
 from app.models.base import EmailContent, Order, OrderItem, Product
 
+# Order lines are "<qty> [units] [of] <name>" or "<name> <marker> <qty> [units]", where the marker
+# (dash, colon, parenthesis, x, ×, qty, need) keeps prose and dates ending in a number from matching.
+# Separator runs are bounded and the name is never captured, so neither pattern backtracks quadratically.
+_LEADING_QTY_RE = re.compile(
+    r'^[\s\-*•–—]*(\d+)\s*(?:pcs|pieces|units|qty|x|×)?[\s\-x×:*.,]*(?:of\s+)?',
+    re.IGNORECASE
+)
+_TRAILING_QTY_RE = re.compile(
+    r'(?:[-–—:(×]|\b(?:qty|quantity|need)\b|\bx)[\s\-–—:]{0,5}(?:(?:qty|quantity|need)\b[\s:]{0,3})?'
+    r'(\d+)(?:\s{0,3}(?:pcs|pieces|units)\b)?\)?$',
+    re.IGNORECASE
+)
+_NAME_STRIP_CHARS = ' -–—:x×*.,'
+
+
+def split_order_line(line: str) -> Optional[Tuple[int, str]]:
+    """Split an order line into (quantity, product text), or None if it does not look like one"""
+    line = line.rstrip(' \t.,!?')
+    m = _LEADING_QTY_RE.match(line)
+    if m:
+        name = line[m.end():].strip(_NAME_STRIP_CHARS)
+        if name:
+            return int(m.group(1)), name
+    m = _TRAILING_QTY_RE.search(line)
+    if m:
+        name = line[:m.start()].strip(_NAME_STRIP_CHARS)
+        if name:
+            return int(m.group(1)), name
+    return None
+
+# Numeric catalog columns, converted once when the catalog is loaded
+CATALOG_COLUMN_TYPES = {
+    "Price": float,
+    "Available_in_Stock": int,
+    "Min_Order_Quantity": int,
+}
+
+def load_catalog(catalog_path: str) -> List[Dict]:
+    """Read the product catalog CSV into a list of row dicts with typed numeric columns"""
+    with open(catalog_path, newline='', encoding='utf-8') as f:
+        records = list(csv.DictReader(f))
+    for record in records:
+        for column, cast in CATALOG_COLUMN_TYPES.items():
+            record[column] = cast(record[column])
+    return records
+
+# Minimum fuzz.ratio for a line to be matched to a catalog product. Names differ mostly in their
+# model numbers, so lower scores pair unknown products with the wrong SKU
+FUZZY_MATCH_CUTOFF = 80
+
 NON_PRODUCT_PHRASES = [
     "deliver to", "let me know", "pricing", "availability", "before", "address", "do deliver", "meguro", "japan"
 ]
 
+# Address extraction: common keywords that introduce a delivery address
+_ADDRESS_KEYWORDS_RE = re.compile(
+    r'(ship to|send to|delivery address|please deliver to|deliver to|recipient|address is|ship them to)', re.IGNORECASE
+)
+_ADDR_RE = re.compile(
+    r'(street|st|avenue|ave|road|rd|lane|ln|blvd|drive|dr|way|court|ct|plaza|circle|parkway|square|block|bldg|suite|apt|unit|room|po box|city|,)',
+    re.IGNORECASE
+)
+# Street words that mark a numbered line like "56 High Street, London" as an address, not an order line
+_STREET_RE = re.compile(
+    r'\b(street|st|avenue|ave|road|rd|lane|ln|blvd|boulevard|drive|dr|court|ct|plaza|parkway|suite|apt|po box)\b',
+    re.IGNORECASE
+)
+_PRODUCT_LINE_RE = re.compile(r'(pcs|qty|x\s*\d+|need \d+)', re.IGNORECASE)
+# Date extraction: common keywords that introduce a delivery date
+_DATE_KEYWORDS_RE = re.compile(
+    r'\b(before|by|deadline|requested delivery date|deliver on|deliver before|delivery date|needed on|arrive by|'
+    r'no later than|expected on|required delivery date)\b',
+    re.IGNORECASE
+)
+_MONTHS = r'(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)'
+# Common explicit date shapes, tried before falling back to dateparser
+_DATE_FAST_RE = re.compile(
+    r'\b(\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4}|\d{1,2}\s+' + _MONTHS + r',?\s+\d{4}|' + _MONTHS + r'\s+\d{1,2},?\s+\d{4})\b',
+    re.IGNORECASE
+)
+_DATE_FAST_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%d/%m/%Y', '%d %B %Y', '%d %b %Y', '%B %d %Y', '%b %d %Y']
+
+def parse_fast_date(text: str) -> str:
+    """Return the first explicit date in the text as YYYY-MM-DD, or None."""
+    for m in _DATE_FAST_RE.finditer(text):
+        date_str = ' '.join(m.group(1).replace(',', ' ').split())
+        for fmt in _DATE_FAST_FORMATS:
+            try:
+                return datetime.strptime(date_str, fmt).strftime('%Y-%m-%d')
+            except ValueError:
+                continue
+    return None
+
 def build_product_name_regex(product_names):
     escaped_names = [re.escape(name) for name in product_names]
     escaped_names.sort(key=len, reverse=True)
     pattern = r'(' + '|'.join(escaped_names) + r')'
     return pattern
 
+def compile_product_name_regex(product_names):
+    # Prefer re2 (linear-time DFA) or the regex module; the case-insensitive flag is
+    # inlined so the same pattern compiles under all three engines.
+    pattern = r'(?i)\b' + build_product_name_regex(product_names) + r'\b'
+    return _product_re.compile(pattern, _PRODUCT_RE_FLAGS)
+
+# Keyed on a digest so bodies aren't retained; the TTL makes relative dates ("by Friday") re-resolve
+_DELIVERY_DETAILS_CACHE = TTLCache(maxsize=4096, ttl=3600)
+_DELIVERY_DETAILS_LOCK = threading.Lock()
+
 def extract_delivery_details(text: str) -> dict:
+    key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    with _DELIVERY_DETAILS_LOCK:
+        details = _DELIVERY_DETAILS_CACHE.get(key)
+    if details is None:
+        details = _extract_delivery_details(text)
+        with _DELIVERY_DETAILS_LOCK:
+            _DELIVERY_DETAILS_CACHE[key] = details
+    # Copy so callers can't mutate the cached result
+    return dict(details)
+
+def _extract_delivery_details(text: str) -> dict:
     print("=== Extracting delivery details from email ===")
     print(text)
     lines = [line.strip() for line in text.splitlines() if line.strip()]
@@ -24,23 +149,20 @@ def extract_delivery_details(text: str) -> dict:
     date = None
 
     # Address extraction: look for common keywords and grab the next non-empty line if needed
-    address_keywords = [
-        "ship to", "send to", "delivery address", "please deliver to", "deliver to", "recipient", "address is", "ship them to"
-    ]
     for i, line in enumerate(lines):
-        for keyword in address_keywords:
-            if keyword in line.lower():
-                after_colon = line.split(':', 1)[-1].strip()
-                if after_colon and after_colon.lower() != keyword:
-                    address = after_colon
-                elif i+1 < len(lines):
-                    next_line = lines[i+1]
-                    # If the next line is a name, and the line after that looks like an address, combine them
-                    if i+2 < len(lines) and re.search(r'(street|st|avenue|ave|road|rd|lane|ln|blvd|drive|dr|way|court|ct|plaza|circle|parkway|square|block|bldg|suite|apt|unit|room|po box|city|,)', lines[i+2], re.IGNORECASE):
-                        address = next_line + ', ' + lines[i+2]
-                    else:
-                        address = next_line
-                break
+        keyword_match = _ADDRESS_KEYWORDS_RE.search(line)
+        if keyword_match:
+            keyword = keyword_match.group(1).lower()
+            after_colon = line.split(':', 1)[-1].strip()
+            if after_colon and after_colon.lower() != keyword:
+                address = after_colon
+            elif i+1 < len(lines):
+                next_line = lines[i+1]
+                # If the next line is a name, and the line after that looks like an address, combine them
+                if i+2 < len(lines) and _ADDR_RE.search(lines[i+2]):
+                    address = next_line + ', ' + lines[i+2]
+                else:
+                    address = next_line
         if address:
             break
 
@@ -48,32 +170,30 @@ def extract_delivery_details(text: str) -> dict:
     if not address:
         for i, line in enumerate(lines):
             # Ignore lines that look like product lines
-            if re.search(r'(pcs|qty|x\s*\d+|need \d+)', line, re.IGNORECASE):
+            if _PRODUCT_LINE_RE.search(line):
                 continue
             # Look for address-like lines
-            if re.search(r'(street|st|avenue|ave|road|rd|lane|ln|blvd|drive|dr|way|court|ct|plaza|circle|parkway|square|block|bldg|suite|apt|unit|room|po box|city|,)', line, re.IGNORECASE):
+            if _ADDR_RE.search(line):
                 address = line
                 break
 
     print("Extracted address:", address)
 
     # Date extraction: look for common keywords and parse the date
-    date_keywords = [
-        "before", "by", "deadline", "requested delivery date", "deliver on", "deliver before",
-        "delivery date", "needed on", "arrive by", "no later than", "expected on", "required delivery date"
-    ]
     for line in lines:
-        for keyword in date_keywords:
-            if keyword in line.lower():
-                date_str = line.split(':', 1)[-1] if ':' in line else line
-                parsed_date = dateparser.parse(date_str, settings={'PREFER_DATES_FROM': 'future'})
-                if parsed_date:
-                    date = parsed_date.strftime('%Y-%m-%d')
-                    break
-        if date:
-            break
+        if _DATE_KEYWORDS_RE.search(line):
+            date_str = line.split(':', 1)[-1] if ':' in line else line
+            date = parse_fast_date(date_str)
+            if date:
+                break
+            parsed_date = dateparser.parse(date_str, settings={'PREFER_DATES_FROM': 'future'})
+            if parsed_date:
+                date = parsed_date.strftime('%Y-%m-%d')
+                break
 
-    # Fallback: search for any date-like phrase in the email
+    # Fallback: search for any date-like phrase in the email, explicit dates first
+    if not date:
+        date = parse_fast_date(text)
     if not date:
         found = search_dates(text, settings={'PREFER_DATES_FROM': 'future'})
         if found:
@@ -84,27 +204,35 @@ def extract_delivery_details(text: str) -> dict:
 
 class EmailProcessor:
     def __init__(self, catalog_path: str):
-        self.catalog = pd.read_csv(catalog_path)
-        self.product_name_pattern = build_product_name_regex(self.catalog['Product_Name'].tolist())
+        self.catalog = load_catalog(catalog_path)
+        self.by_name_lower = {r['Product_Name'].lower(): r for r in self.catalog}
+        self.by_code_lower = {r['Product_Code'].lower(): r for r in self.catalog}
+        self.all_names = list(self.by_name_lower) + list(self.by_code_lower)
+        self.product_names = [r['Product_Name'] for r in self.catalog]
+        self._find_product_cached = lru_cache(maxsize=4096)(self._lookup_product)
+        self.product_name_re = compile_product_name_regex(self.product_names)
         self.sku_pattern = re.compile(r'[A-Z]{2,3}-\d{3,4}', re.IGNORECASE)
         self.quantity_pattern = re.compile(r'(\d+)\s*(?:pcs|pieces|units|qty|quantity)?', re.IGNORECASE)
 
     def find_product(self, extracted_name: str) -> Dict:
-        match = self.catalog[self.catalog['Product_Name'].str.lower() == extracted_name.lower()]
-        if not match.empty:
-            return match.iloc[0].to_dict()
-        match = self.catalog[self.catalog['Product_Code'].str.lower() == extracted_name.lower()]
-        if not match.empty:
-            return match.iloc[0].to_dict()
-        all_names = self.catalog['Product_Name'].tolist() + self.catalog['Product_Code'].tolist()
-        matches = difflib.get_close_matches(extracted_name, all_names, n=1, cutoff=0.8)
-        if matches:
-            match_name = matches[0]
-            match = self.catalog[(self.catalog['Product_Name'] == match_name) | (self.catalog['Product_Code'] == match_name)]
-            if not match.empty:
-                return match.iloc[0].to_dict()
+        return self._find_product_cached(extracted_name.lower())
+
+    def _lookup_product(self, n: str) -> Dict:
+        return self.by_name_lower.get(n) or self.by_code_lower.get(n) or self._fuzzy(n)
+
+    def _fuzzy(self, name: str) -> Dict:
+        # Catalog names are multi-word and codes follow sku_pattern, so anything else can't be close
+        if len(name) < 3 or (self.sku_pattern.fullmatch(name) is None and ' ' not in name):
+            return None
+        match = process.extractOne(name, self.all_names, scorer=fuzz.ratio, score_cutoff=80)
+        if match:
+            return self.by_name_lower.get(match[0]) or self.by_code_lower.get(match[0])
         return None
 
+    def match_products(self, text: str) -> List[str]:
+        """Return catalog product names found verbatim in the text, in order of appearance."""
+        return [m.group(1) for m in self.product_name_re.finditer(text)]
+
     def extract_delivery_details(self, text: str) -> Dict:
         return extract_delivery_details(text)
 
@@ -124,36 +252,48 @@ class EmailProcessor:
 
     def extract_products_and_quantities(self, text: str) -> List[Tuple[Dict, int, float, str]]:
         results = []
-        product_names = self.catalog['Product_Name'].tolist()
         for line in text.splitlines():
-            num_match = re.search(r'(\d+)', line)
-            if not num_match:
+            parsed = split_order_line(line)
+            if not parsed:
                 continue
-            quantity = int(num_match.group(1))
-            # Remove the number and try to fuzzy match the rest
-            candidate = re.sub(r'(\d+)', '', line).strip(' -:x*.,')
-            best = difflib.get_close_matches(candidate, product_names, n=1, cutoff=0.6)
-            if best:
-                extracted_name = best[0]
+            # Try to fuzzy match the product part of the line
+            quantity, candidate = parsed
+            exact = self.match_products(line)[:1]
+            fuzzy = None if exact else process.extractOne(
+                candidate, self.product_names, scorer=fuzz.ratio, score_cutoff=FUZZY_MATCH_CUTOFF
+            )
+            if exact:
+                extracted_name = exact[0]
                 product = self.find_product(extracted_name)
                 confidence = 1.0
+            elif fuzzy:
+                extracted_name = fuzzy[0]
+                product = self.find_product(extracted_name)
+                confidence = fuzzy[1] / 100
             else:
                 extracted_name = candidate
                 product = None
                 confidence = 0.5
             if any(phrase in extracted_name.lower() for phrase in NON_PRODUCT_PHRASES):
                 continue
+            if product is None and _STREET_RE.search(extracted_name):
+                continue
             results.append((product, quantity, confidence, extracted_name))
         return results
 
-    def validate_against_catalog(self, product: Dict, quantity: int) -> Tuple[bool, List[str], List[str]]:
+    def validate_against_catalog(self, product: Dict, quantity: int, extracted_name: str = None) -> Tuple[bool, List[str], List[str]]:
         issues = []
         suggestions = []
         if not product:
             issues.append("Product not found in catalog")
-            # Suggest similar SKUs
-            all_names = self.catalog['Product_Name'].tolist() + self.catalog['Product_Code'].tolist()
-            similar = difflib.get_close_matches(product, all_names, n=2, cutoff=0.6) if product else []
+            # Suggest similar products based on what was written in the email
+            matches = process.extract(
+                extracted_name.lower(), self.all_names, scorer=fuzz.ratio, limit=2, score_cutoff=60
+            ) if extracted_name else []
+            similar = [
+                self.by_name_lower[m[0]]['Product_Name'] if m[0] in self.by_name_lower else self.by_code_lower[m[0]]['Product_Code']
+                for m in matches
+            ]
             if similar:
                 suggestions.extend(similar)
             return False, issues, suggestions
@@ -167,11 +307,11 @@ class EmailProcessor:
 
     def process_email(self, email: EmailContent) -> Order:
         extracted_items = self.extract_products_and_quantities(email.raw_content)
-        filtered_items = [item for item in extracted_items if item[2] >= 0.7]
         order_items = []
         total_confidence = 0.0
-        for product, quantity, confidence, extracted_name in filtered_items:
-            is_valid, issues, suggestions = self.validate_against_catalog(product, quantity)
+        for product, quantity, confidence, extracted_name in extracted_items:
+            # Unmatched lines are kept with a "not found" issue, so the customer's request is never silently dropped
+            is_valid, issues, suggestions = self.validate_against_catalog(product, quantity, extracted_name)
             sku = product['Product_Code'] if product else extracted_name
             item = OrderItem(
                 sku=sku,
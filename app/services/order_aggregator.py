@@ -1,70 +1,159 @@
 from typing import List, Dict, Any
-from collections import defaultdict
-import pandas as pd
+from collections import defaultdict, Counter
+from itertools import combinations
+from bisect import bisect_left, bisect_right, insort
+from cachetools import TTLCache
+import numpy as np
 from datetime import datetime, timedelta
 from app.models.base import OrderRequest
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Above this many distinct SKUs the dense pair-count matrix gets too large
+_NUMBA_MAX_SKUS = 2048
+# The JIT path zeroes an n x n matrix per call; it only beats Counter (~1µs per pair) once the
+# orders hold enough pairs to pay for that, measured at roughly one pair per 64 matrix cells
+_NUMBA_MIN_PAIRS = 1000
+_NUMBA_CELLS_PER_PAIR = 64
+
+if njit is not None:
+    @njit('void(i4[:], i4[:], i8[:, :])', cache=True)
+    def _count_cooccurrences(order_offsets, order_skus, counts):
+        """Count SKU pairs per order; each order's ids are sorted and unique."""
+        for o in range(order_offsets.shape[0] - 1):
+            start = order_offsets[o]
+            end = order_offsets[o + 1]
+            for i in range(start, end):
+                for j in range(i + 1, end):
+                    counts[order_skus[i], order_skus[j]] += 1
+
 class OrderAggregator:
     def __init__(self):
+        # Full orders are still kept for merge_orders; every insight reads the id-indexed arrays below
         self.orders = []
-        self.product_patterns = defaultdict(int)
-        self.customer_patterns = defaultdict(int)
+        # Per-SKU quantities, and per-customer order and item counts, indexed by interned id
+        self.product_patterns = np.zeros(16, dtype=np.int64)
+        self.customer_patterns = np.zeros(16, dtype=np.int64)
+        self.customer_items = np.zeros(16, dtype=np.int64)
+        self._customer_to_id: Dict[tuple, int] = {}
+        self._id_to_customer: List[tuple] = []
         self.time_patterns = defaultdict(int)
+        # Delivery dates parsed once on add_order, kept sorted for window queries
+        self._order_dates: List[datetime] = []
+        self._time_insights_cache = TTLCache(maxsize=32, ttl=60)
+        self._sku_to_id: Dict[str, int] = {}
+        self._id_to_sku: List[str] = []
+        # Each order's unique SKU ids in one flat buffer (CSR layout): order o owns
+        # _order_skus[_order_offsets[o]:_order_offsets[o + 1]]
+        self._order_skus = np.zeros(64, dtype=np.int32)
+        self._order_offsets = np.zeros(16, dtype=np.int32)
+        self._order_count = 0
 
     def add_order(self, order: OrderRequest):
         """Add a new order to the aggregator"""
         self.orders.append(order)
         self._update_patterns(order)
 
+    def _intern(self, sku: str) -> int:
+        """Map a SKU to a stable integer id, assigning the next id on first sight"""
+        sku_id = self._sku_to_id.get(sku)
+        if sku_id is None:
+            sku_id = len(self._id_to_sku)
+            self._sku_to_id[sku] = sku_id
+            self._id_to_sku.append(sku)
+        return sku_id
+
+    @staticmethod
+    def _ensure_capacity(counts: np.ndarray, size: int) -> np.ndarray:
+        """Return counts grown geometrically so it holds at least size entries"""
+        if size <= len(counts):
+            return counts
+        grown = np.zeros(max(size, 2 * len(counts)), dtype=counts.dtype)
+        grown[:len(counts)] = counts
+        return grown
+
     def _update_patterns(self, order: OrderRequest):
         """Update various pattern tracking"""
         # Product patterns
-        for item in order.items:
-            self.product_patterns[item.sku] += item.quantity
+        sku_ids = np.array([self._intern(item.sku) for item in order.items], dtype=np.int32)
+        self.product_patterns = self._ensure_capacity(self.product_patterns, len(self._id_to_sku))
+        quantities = np.array([item.quantity for item in order.items], dtype=np.int64)
+        np.add.at(self.product_patterns, sku_ids, quantities)
+        unique_ids = np.unique(sku_ids)
+        start = self._order_offsets[self._order_count]
+        end = start + len(unique_ids)
+        self._order_skus = self._ensure_capacity(self._order_skus, end)
+        self._order_skus[start:end] = unique_ids
+        self._order_offsets = self._ensure_capacity(self._order_offsets, self._order_count + 2)
+        self._order_count += 1
+        self._order_offsets[self._order_count] = end
 
         # Customer patterns
-        customer_key = f"{order.customer_name}_{order.delivery_details.address}"
-        self.customer_patterns[customer_key] += 1
+        customer_key = (order.customer_name, order.delivery_details.address)
+        customer_id = self._customer_to_id.get(customer_key)
+        if customer_id is None:
+            customer_id = len(self._id_to_customer)
+            self._customer_to_id[customer_key] = customer_id
+            self._id_to_customer.append(customer_key)
+        self.customer_patterns = self._ensure_capacity(self.customer_patterns, customer_id + 1)
+        self.customer_items = self._ensure_capacity(self.customer_items, customer_id + 1)
+        self.customer_patterns[customer_id] += 1
+        self.customer_items[customer_id] += quantities.sum()
 
-        # Time patterns (group by week)
+        # Time patterns (group by week); emails without a recognisable date are left out
+        if not order.delivery_details.date:
+            return
         order_date = datetime.strptime(order.delivery_details.date, "%Y-%m-%d")
+        insort(self._order_dates, order_date)
+        self._time_insights_cache.clear()
         week_key = order_date.strftime("%Y-%W")
         self.time_patterns[week_key] += 1
 
     def get_common_products(self, min_occurrences: int = 2) -> List[Dict[str, Any]]:
         """Get products that are commonly ordered together"""
-        product_pairs = defaultdict(int)
-        
-        for order in self.orders:
-            skus = [item.sku for item in order.items]
-            for i in range(len(skus)):
-                for j in range(i + 1, len(skus)):
-                    pair = tuple(sorted([skus[i], skus[j]]))
-                    product_pairs[pair] += 1
+        n_skus = len(self._id_to_sku)
+        if njit is not None and n_skus <= _NUMBA_MAX_SKUS:
+            sizes = np.diff(self._order_offsets[:self._order_count + 1]).astype(np.int64)
+            total_pairs = int((sizes * (sizes - 1) // 2).sum())
+            if total_pairs >= max(_NUMBA_MIN_PAIRS, n_skus * n_skus // _NUMBA_CELLS_PER_PAIR):
+                return self._get_common_products_numba(min_occurrences)
+
+        offsets = self._order_offsets[:self._order_count + 1].tolist()
+        order_skus = self._order_skus[:offsets[-1]].tolist()
+        product_pairs = Counter()
+        for start, end in zip(offsets, offsets[1:]):
+            product_pairs.update(combinations(order_skus[start:end], 2))
 
         return [
-            {"products": pair, "occurrences": count}
-            for pair, count in product_pairs.items()
+            {"products": tuple(sorted((self._id_to_sku[a], self._id_to_sku[b]))), "occurrences": count}
+            for (a, b), count in product_pairs.items()
             if count >= min_occurrences
         ]
 
+    def _get_common_products_numba(self, min_occurrences: int) -> List[Dict[str, Any]]:
+        """JIT-compiled co-occurrence count over a CSR layout of interned SKU ids"""
+        n_skus = len(self._id_to_sku)
+        order_offsets = self._order_offsets[:self._order_count + 1]
+        order_skus = self._order_skus[:order_offsets[-1]]
+        counts = np.zeros((n_skus, n_skus), dtype=np.int64)
+        _count_cooccurrences(order_offsets, order_skus, counts)
+
+        rows, cols = np.nonzero(counts >= max(min_occurrences, 1))
+        return [
+            {"products": tuple(sorted((self._id_to_sku[a], self._id_to_sku[b]))), "occurrences": count}
+            for a, b, count in zip(rows.tolist(), cols.tolist(), counts[rows, cols].tolist())
+        ]
+
     def get_customer_insights(self) -> List[Dict[str, Any]]:
         """Get insights about customer ordering patterns"""
         customer_insights = []
         
-        for customer_key, order_count in self.customer_patterns.items():
-            customer_name, address = customer_key.split("_", 1)
-            customer_orders = [
-                order for order in self.orders
-                if order.customer_name == customer_name
-                and order.delivery_details.address == address
-            ]
-            
-            total_items = sum(
-                item.quantity
-                for order in customer_orders
-                for item in order.items
-            )
+        for customer_id, (customer_name, address) in enumerate(self._id_to_customer):
+            order_count = int(self.customer_patterns[customer_id])
+            total_items = int(self.customer_items[customer_id])
             
             customer_insights.append({
                 "customer_name": customer_name,
@@ -78,24 +167,28 @@ class OrderAggregator:
 
     def get_time_based_insights(self, days: int = 30) -> Dict[str, Any]:
         """Get insights about ordering patterns over time"""
+        cached = self._time_insights_cache.get(days)
+        if cached is not None:
+            return cached
+
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        orders_in_period = [
-            order for order in self.orders
-            if start_date <= datetime.strptime(order.delivery_details.date, "%Y-%m-%d") <= end_date
+        dates_in_period = self._order_dates[
+            bisect_left(self._order_dates, start_date):bisect_right(self._order_dates, end_date)
         ]
         
         daily_orders = defaultdict(int)
-        for order in orders_in_period:
-            date = order.delivery_details.date
-            daily_orders[date] += 1
+        for order_date in dates_in_period:
+            daily_orders[order_date.strftime("%Y-%m-%d")] += 1
         
-        return {
-            "total_orders": len(orders_in_period),
-            "average_orders_per_day": len(orders_in_period) / days,
+        insights = {
+            "total_orders": len(dates_in_period),
+            "average_orders_per_day": len(dates_in_period) / days,
             "daily_order_counts": dict(daily_orders)
         }
+        self._time_insights_cache[days] = insights
+        return insights
 
     def merge_orders(self, order_ids: List[str]) -> Dict[str, Any]:
         """Merge multiple orders into a single order"""
@@ -115,8 +208,8 @@ class OrderAggregator:
         
         # Use the most recent delivery date
         latest_delivery = max(
-            order.delivery_details.date
-            for order in selected_orders
+            (order.delivery_details.date for order in selected_orders if order.delivery_details.date),
+            default=None
         )
         
         # Combine notes
@@ -152,10 +245,12 @@ class OrderAggregator:
             "customer_insights": self.get_customer_insights(),
             "time_based_insights": self.get_time_based_insights(),
             "total_orders": len(self.orders),
-            "total_customers": len(self.customer_patterns),
-            "most_ordered_products": sorted(
-                self.product_patterns.items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:10]
-        } 
\ No newline at end of file
+            "total_customers": len(self._customer_to_id),
+            "most_ordered_products": self._get_most_ordered_products(10)
+        }
+
+    def _get_most_ordered_products(self, limit: int) -> List[tuple]:
+        """Top SKUs by total quantity, ties kept in first-seen order"""
+        totals = self.product_patterns[:len(self._id_to_sku)]
+        top_ids = np.argsort(-totals, kind="stable")[:limit]
+        return [(self._id_to_sku[sku_id], int(totals[sku_id])) for sku_id in top_ids.tolist()] 
\ No newline at end of file
@@ -0,0 +1,48 @@
+from typing import Dict, Any, Optional
+import orjson
+import redis.asyncio as redis
+from redis.exceptions import WatchError
+
+class OrderStore:
+    """Shares processed orders between uvicorn workers through Redis"""
+
+    def __init__(self, redis_url: str = "redis://localhost:6379/0", ttl_seconds: int = 86400, client: redis.Redis = None):
+        self.client = client if client is not None else redis.Redis.from_url(redis_url)
+        self.ttl_seconds = ttl_seconds
+
+    async def save(self, order_id: str, order: Dict[str, Any]):
+        """Store an order and mark it as the most recently processed one"""
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(f"order:{order_id}", orjson.dumps(order), ex=self.ttl_seconds)
+            pipe.set("order:last", order_id, ex=self.ttl_seconds)
+            await pipe.execute()
+
+    async def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch an order by ID, or None if it is unknown or expired"""
+        data = await self.client.get(f"order:{order_id}")
+        return orjson.loads(data) if data else None
+
+    async def get_last(self) -> Optional[Dict[str, Any]]:
+        """Fetch the most recently processed order"""
+        order_id = await self.client.get("order:last")
+        return await self.get(order_id.decode()) if order_id else None
+
+    async def update_status(self, order_id: str, status: str) -> bool:
+        """Set an order's status, keeping its remaining TTL; returns False if the order is missing"""
+        key = f"order:{order_id}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            # Optimistic lock: retry if another worker rewrites the order between our read and write
+            while True:
+                try:
+                    await pipe.watch(key)
+                    data = await pipe.get(key)
+                    if data is None:
+                        return False
+                    order = orjson.loads(data)
+                    order["status"] = status
+                    pipe.multi()
+                    pipe.set(key, orjson.dumps(order), keepttl=True)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
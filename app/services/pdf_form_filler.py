@@ -1,9 +1,10 @@
 from typing import Dict, Any
-from PyPDF2 import PdfReader, PdfWriter
+from pypdf import PdfReader, PdfWriter
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import io
 import os
+import uuid
 from datetime import datetime
 
 class PDFFormFiller:
@@ -12,10 +13,8 @@ class PDFFormFiller:
         if not os.path.exists(template_path):
             self._create_default_template()
 
-    def _create_default_template(self):
-        """Create a default sales order template if none exists"""
-        c = canvas.Canvas(self.template_path, pagesize=letter)
-        
+    def _draw_static_layout(self, c: canvas.Canvas):
+        """Draw the header and field labels shared by every sales order"""
         # Add header
         c.setFont("Helvetica-Bold", 16)
         c.drawString(50, 750, "SALES ORDER")
@@ -33,7 +32,11 @@ class PDFFormFiller:
         
         for text, x, y in fields:
             c.drawString(x, y, text)
-        
+
+    def _create_default_template(self):
+        """Create a default sales order template if none exists"""
+        c = canvas.Canvas(self.template_path, pagesize=letter)
+        self._draw_static_layout(c)
         c.save()
 
     def fill_form(self, order_data: Dict[str, Any]) -> bytes:
@@ -46,30 +49,23 @@ class PDFFormFiller:
         Returns:
             bytes: PDF file content
         """
-        # Create a new PDF with ReportLab
         packet = io.BytesIO()
         c = canvas.Canvas(packet, pagesize=letter)
-        
-        # Add header
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(50, 750, "SALES ORDER")
+        self._draw_static_layout(c)
         
         # Add order details
         c.setFont("Helvetica", 12)
         c.drawString(200, 700, f"SO-{datetime.now().strftime('%Y%m%d%H%M%S')}")
         c.drawString(200, 680, datetime.now().strftime("%Y-%m-%d"))
-        c.drawString(200, 650, order_data.get("customer_name", "N/A"))
+        c.drawString(200, 650, order_data.get("customer_name") or "N/A")
         
         # Add delivery details
-        delivery = order_data.get("delivery_details", {})
-        address = delivery.get("address", "N/A")
-        c.drawString(200, 620, address)
-        c.drawString(200, 590, delivery.get("date", "N/A"))
+        delivery = order_data.get("delivery_details") or {}
+        c.drawString(200, 620, delivery.get("address") or "N/A")
+        c.drawString(200, 590, delivery.get("date") or "N/A")
         
         # Add items
-        y_position = 560
-        c.drawString(50, y_position, "Items:")
-        y_position -= 20
+        y_position = 540
         
         for item in order_data.get("items", []):
             item_text = f"{item['sku']} - {item['quantity']} units @ ${item['price']:.2f} each"
@@ -78,6 +74,7 @@ class PDFFormFiller:
             
             if y_position < 50:  # Start new page if needed
                 c.showPage()
+                c.setFont("Helvetica", 12)
                 y_position = 750
         
         # Add notes if any
@@ -89,9 +86,6 @@ class PDFFormFiller:
             c.drawString(50, 730, order_data["notes"])
         
         c.save()
-        
-        # Move to the beginning of the StringIO buffer
-        packet.seek(0)
         return packet.getvalue()
 
     def save_filled_form(self, order_data: Dict[str, Any], output_path: str) -> str:
@@ -107,7 +101,10 @@ class PDFFormFiller:
         """
         pdf_content = self.fill_form(order_data)
         
-        with open(output_path, "wb") as f:
+        # Write then rename, so a client polling for the file never sees a partial PDF
+        tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
             f.write(pdf_content)
+        os.replace(tmp_path, output_path)
             
         return output_path 
\ No newline at end of file
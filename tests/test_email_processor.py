@@ -1,6 +1,7 @@
+import time
 import pytest
 from app.models.base import EmailContent
-from app.services.email_processor import EmailProcessor
+from app.services.email_processor import EmailProcessor, extract_delivery_details, parse_fast_date
 from datetime import datetime
 
 def test_extract_skus_and_quantities():
@@ -56,4 +57,103 @@ def test_process_email():
     assert order.order_id is not None
     assert order.customer_email == "unknown@email.com"
     assert len(order.items) > 0
-    assert 0 <= order.total_confidence_score <= 1 
\ No newline at end of file
+    assert 0 <= order.total_confidence_score <= 1 
+
+def test_parse_fast_date():
+    assert parse_fast_date("Requested delivery date: July 1, 2025") == "2025-07-01"
+    assert parse_fast_date("Deliver by 2025-06-20 please") == "2025-06-20"
+    assert parse_fast_date("Needed on 12/31/2025") == "2025-12-31"
+    assert parse_fast_date("Arrive by 3 Sep 2025") == "2025-09-03"
+    assert parse_fast_date("As soon as possible") is None
+
+def test_extract_products_quantity_after_name():
+    processor = EmailProcessor("content/Product Catalog.csv")
+
+    results = processor.extract_products_and_quantities(
+        "* Bed TRÄNBERG 858 – Qty: 2\n- 9 x Coffee STRÅDAL 620\n- Sofa VIKTMARK 446 x2\n- Loveseat HEMNHOLM 512 ×3"
+    )
+    assert [(product['Product_Name'], quantity) for product, quantity, _, _ in results] == [
+        ("Bed TRÄNBERG 858", 2),
+        ("Coffee STRÅDAL 620", 9),
+        ("Sofa VIKTMARK 446", 2),
+        ("Loveseat HEMNHOLM 512", 3),
+    ]
+
+def test_extract_products_long_separator_line_is_fast():
+    processor = EmailProcessor("content/Product Catalog.csv")
+
+    start = time.perf_counter()
+    assert processor.extract_products_and_quantities(" -" * 8000 + "\n" + "-" * 16000 + "x") == []
+    assert time.perf_counter() - start < 0.5
+
+def test_process_email_ignores_trailing_numbers_in_prose():
+    processor = EmailProcessor("content/Product Catalog.csv")
+
+    with open("content/sample_email_3.txt", encoding="utf-8") as f:
+        email = EmailContent(raw_content=f.read(), received_at=datetime.now())
+
+    order = processor.process_email(email)
+    assert [(item.sku, item.quantity) for item in order.items] == [
+        ("BST-0299", 3),
+        ("ODT-0389", 3),
+        ("CST-0494", 7),
+        ("CST-0482", 3),
+    ]
+
+def test_extract_products_fuzzy_matching():
+    processor = EmailProcessor("content/Product Catalog.csv")
+
+    # A small typo still matches, with confidence taken from the match score
+    product, quantity, confidence, _ = processor.extract_products_and_quantities("- 9 x Coffee STRADAL 620")[0]
+    assert product["Product_Code"] == "CFT-0167"
+    assert 0.8 <= confidence < 1.0
+
+    # A product that is not in the catalog is not matched to a similar-looking SKU
+    for line in ["- 2 units of Storage Cabinet VÄSTBERG 510", "- Nightstand RÅNNAS 122 — Qty: 2"]:
+        product, _, confidence, _ = processor.extract_products_and_quantities(line)[0]
+        assert product is None
+        assert confidence < 0.7
+
+def test_extract_delivery_details_returns_copy_of_cached_result():
+    with open("content/sample_email_1.txt", encoding="utf-8") as f:
+        text = f.read()
+
+    first = extract_delivery_details(text)
+    assert first["date"] == "2025-06-20"
+    first["date"] = None
+    assert extract_delivery_details(text)["date"] == "2025-06-20"
+
+def test_unmatched_items_get_catalog_suggestions():
+    processor = EmailProcessor("content/Product Catalog.csv")
+
+    is_valid, issues, suggestions = processor.validate_against_catalog(None, 2, "Nightstand RÅNNAS 122")
+    assert not is_valid
+    assert issues == ["Product not found in catalog"]
+    assert suggestions[0] == "Nightstand STRÅSUND 322"
+
+    email = EmailContent(raw_content="- Nightstand RÅNNAS 122 — Qty: 2", received_at=datetime.now())
+    item = processor.process_email(email).items[0]
+    assert item.sku == "Nightstand RÅNNAS 122"
+    assert item.suggested_replacements == suggestions
+
+def test_unmatched_items_are_kept_without_suggestions():
+    processor = EmailProcessor("content/Product Catalog.csv")
+
+    with open("content/sample_email_7.txt", encoding="utf-8") as f:
+        email = EmailContent(raw_content=f.read(), received_at=datetime.now())
+    items = processor.process_email(email).items
+    assert [(item.sku, item.quantity) for item in items] == [
+        ("Bed Frame EKEBY 754", 1),
+        ("Mattress SOLHEM 820", 1),
+        ("Nightstand RÅNNAS 122", 2),
+    ]
+    assert all(item.validation_issues == ["Product not found in catalog"] for item in items)
+
+    with open("content/sample_email_6.txt", encoding="utf-8") as f:
+        email = EmailContent(raw_content=f.read(), received_at=datetime.now())
+    # The street address below the items must not be read as "56 x High Street"
+    assert [item.sku for item in processor.process_email(email).items] == [
+        "Dining Table BJÖRKVIK 512",
+        "Chair GRÄNSÖ 215",
+        "Bookshelf LÖVÅNG 330",
+    ]
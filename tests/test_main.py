@@ -0,0 +1,74 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.services.order_aggregator import OrderAggregator
+from app.services.order_store import OrderStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "order_store", OrderStore(client=fakeredis.FakeAsyncRedis()))
+    monkeypatch.setattr(main, "order_aggregator", OrderAggregator())
+    monkeypatch.setattr(main, "GENERATED_ORDERS_DIR", str(tmp_path))
+    return TestClient(main.app)
+
+def test_process_email(client):
+    with open("content/sample_email_1.txt", "rb") as f:
+        response = client.post("/api/process-email", files={"file": ("email.txt", f, "text/plain")})
+
+    assert response.status_code == 200
+    order = response.json()
+    assert [item["sku"] for item in order["items"]] == ["CFT-0167", "LVS-0439", "SFA-0142", "WRD-0267"]
+    assert order["delivery_details"]["date"] == "2025-06-20"
+    assert main.order_aggregator.export_insights()["total_orders"] == 1
+
+    # The PDF is written by a background task, which TestClient runs before returning
+    assert os.path.exists(order["pdf_path"])
+    pdf = client.get(f"/api/download-pdf/{order['pdf_filename']}")
+    assert pdf.status_code == 200
+    assert pdf.content.startswith(b"%PDF")
+
+def test_upload_email_then_approve(client):
+    with open("content/sample_email_2.txt", "rb") as f:
+        response = client.post("/api/upload-email", files={"file": ("email.txt", f, "text/plain")})
+    assert response.status_code == 200
+    order = response.json()
+
+    response = client.post("/api/approve-order", json=order)
+    assert response.json() == {"status": "approved", "order_id": order["order_id"]}
+
+def test_process_email_pdf_names_are_unique(client):
+    with open("content/sample_email_1.txt", "rb") as f:
+        content = f.read()
+
+    filenames = {
+        client.post("/api/process-email", files={"file": ("email.txt", content, "text/plain")}).json()["pdf_filename"]
+        for _ in range(3)
+    }
+    assert len(filenames) == 3
+
+def test_failed_pdf_is_reported(client, monkeypatch):
+    def fail(order_data, output_path):
+        raise RuntimeError("render failed")
+    monkeypatch.setattr(main.pdf_form_filler, "save_filled_form", fail)
+
+    with open("content/sample_email_1.txt", "rb") as f:
+        order = client.post("/api/process-email", files={"file": ("email.txt", f, "text/plain")}).json()
+
+    response = client.get(f"/api/download-pdf/{order['pdf_filename']}")
+    assert response.status_code == 500
+    assert response.json()["detail"] == "PDF generation failed"
+
+def test_redis_failure_does_not_count_order(client, monkeypatch):
+    async def fail(order_id, order):
+        raise main.RedisError("connection refused")
+    monkeypatch.setattr(main.order_store, "save", fail)
+
+    with open("content/sample_email_1.txt", "rb") as f:
+        response = client.post("/api/process-email", files={"file": ("email.txt", f, "text/plain")})
+
+    assert response.status_code == 503
+    assert main.order_aggregator.export_insights()["total_orders"] == 0
@@ -0,0 +1,66 @@
+import pytest
+from app.models.base import DeliveryDetails, OrderItem, OrderRequest
+from app.services.order_aggregator import OrderAggregator
+
+def make_order(order_id, skus, customer_name="Acme", address="1 Main St", date="2025-06-20"):
+    return OrderRequest(
+        id=order_id,
+        customer_name=customer_name,
+        items=[OrderItem(sku=sku, quantity=quantity, confidence_score=1.0) for sku, quantity in skus],
+        delivery_details=DeliveryDetails(address=address, date=date),
+        total_confidence_score=1.0
+    )
+
+def test_customer_insights():
+    aggregator = OrderAggregator()
+    aggregator.add_order(make_order("1", [("A", 2), ("B", 3)]))
+    aggregator.add_order(make_order("2", [("A", 5)]))
+    aggregator.add_order(make_order("3", [("C", 1)], customer_name="Globex_Corp", address="2 Side St"))
+
+    assert aggregator.get_customer_insights() == [
+        {"customer_name": "Acme", "address": "1 Main St", "order_count": 2, "total_items": 10, "average_items_per_order": 5.0},
+        {"customer_name": "Globex_Corp", "address": "2 Side St", "order_count": 1, "total_items": 1, "average_items_per_order": 1.0},
+    ]
+    insights = aggregator.export_insights()
+    assert insights["total_customers"] == 2
+    assert insights["most_ordered_products"] == [("A", 7), ("B", 3), ("C", 1)]
+
+def common_products(aggregator, min_occurrences):
+    return sorted(
+        (pair["products"], pair["occurrences"])
+        for pair in aggregator.get_common_products(min_occurrences)
+    )
+
+def test_common_products_counts_each_pair_once_per_order():
+    aggregator = OrderAggregator()
+    # The same SKU listed twice in one order neither pairs with itself nor doubles its pairs
+    aggregator.add_order(make_order("1", [("B", 1), ("A", 1), ("B", 2)]))
+    aggregator.add_order(make_order("2", [("A", 1), ("B", 1), ("C", 1)]))
+
+    assert common_products(aggregator, 1) == [(("A", "B"), 2), (("A", "C"), 1), (("B", "C"), 1)]
+
+def test_common_products_min_occurrences():
+    aggregator = OrderAggregator()
+    aggregator.add_order(make_order("1", [("A", 1), ("B", 1), ("C", 1)]))
+    aggregator.add_order(make_order("2", [("A", 1), ("B", 1)]))
+    aggregator.add_order(make_order("3", [("A", 1)]))
+
+    assert common_products(aggregator, 2) == [(("A", "B"), 2)]
+    assert common_products(aggregator, 3) == []
+
+def test_common_products_numba_matches_counter():
+    pytest.importorskip("numba")
+
+    aggregator = OrderAggregator()
+    skus = ["SKU-%02d" % i for i in range(12)]
+    for n in range(40):
+        picked = [skus[(n * 7 + k * 5) % len(skus)] for k in range(n % 6)]
+        aggregator.add_order(make_order(str(n), [(sku, 1) for sku in picked]))
+
+    # Too few pairs for get_common_products to pick the JIT path, so this is the Counter result
+    for min_occurrences in (1, 2, 5):
+        jit_result = sorted(
+            (pair["products"], pair["occurrences"])
+            for pair in aggregator._get_common_products_numba(min_occurrences)
+        )
+        assert common_products(aggregator, min_occurrences) == jit_result
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from app.services.order_store import OrderStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def make_store(ttl_seconds: int = 60) -> OrderStore:
+    return OrderStore(ttl_seconds=ttl_seconds, client=fakeredis.FakeAsyncRedis())
+
+def test_save_and_get():
+    async def scenario():
+        store = make_store()
+        assert await store.get("ORD-1") is None
+        assert await store.get_last() is None
+
+        await store.save("ORD-1", {"order_id": "ORD-1", "status": "pending"})
+        await store.save("ORD-2", {"order_id": "ORD-2", "status": "pending"})
+
+        assert await store.get("ORD-1") == {"order_id": "ORD-1", "status": "pending"}
+        assert (await store.get_last())["order_id"] == "ORD-2"
+        assert 0 < await store.client.ttl("order:ORD-1") <= 60
+
+    asyncio.run(scenario())
+
+def test_update_status_keeps_ttl():
+    async def scenario():
+        store = make_store()
+        assert not await store.update_status("missing", "approved")
+
+        await store.save("ORD-1", {"order_id": "ORD-1", "status": "pending"})
+        assert await store.update_status("ORD-1", "approved")
+        assert (await store.get("ORD-1"))["status"] == "approved"
+        assert 0 < await store.client.ttl("order:ORD-1") <= 60
+
+    asyncio.run(scenario())
+
+def test_concurrent_status_updates_are_not_lost():
+    async def scenario():
+        store = make_store()
+        await store.save("ORD-1", {"order_id": "ORD-1", "status": "pending", "items": []})
+
+        results = await asyncio.gather(*(store.update_status("ORD-1", f"status-{i}") for i in range(10)))
+        assert all(results)
+        order = await store.get("ORD-1")
+        assert order["status"] in {f"status-{i}" for i in range(10)}
+        assert order["items"] == []
+
+    asyncio.run(scenario())